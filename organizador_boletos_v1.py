@@ -1,12 +1,22 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
+import multiprocessing
+import multiprocessing.connection
 import os
+import sys
 import re
+import bisect
+import heapq
 import fitz  # PyMuPDF
 import pandas as pd
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, Optional, List, Sequence, Tuple
 import queue
+import itertools
+import collections
+from array import array
+import email.policy
+from email.parser import BytesFeedParser
 from datetime import datetime, timedelta
 
 # --- BIBLIOTECAS PARA QR CODE ---
@@ -18,8 +28,653 @@ try:
 except ImportError:
     QR_CODE_DISPONIVEL = False
 
-class ExtratorBoletosGUI:
+class IndiceFaixa:
+    """Chaves ordenadas de um campo (valor ou vencimento) para filtros por faixa"""
+
+    def __init__(self):
+        self.chaves = []              # chaves em ordem crescente
+        self.seqs = []                # seq alinhados a self.chaves
+        self.por_seq = {}             # seq -> chave
+        self.presentes = bytearray()  # 1 para cada seq que tem o campo
+        self._ultima_mascara = None   # (inicio, fim, tamanho, total de chaves, máscara)
+
+    def adicionar(self, seq: int, chave) -> None:
+        self.presentes.append(chave is not None)
+        if chave is None:
+            return
+        posicao = bisect.bisect_right(self.chaves, chave)
+        self.chaves.insert(posicao, chave)
+        self.seqs.insert(posicao, seq)
+        self.por_seq[seq] = chave
+
+    def limites(self, minimo, maximo) -> Tuple[int, int]:
+        """Posições [inicio, fim) em self.chaves que caem na faixa"""
+        inicio = 0 if minimo is None else bisect.bisect_left(self.chaves, minimo)
+        fim = len(self.chaves) if maximo is None else bisect.bisect_right(self.chaves, maximo)
+        return inicio, fim
+
+    def mascara(self, inicio: int, fim: int, tamanho: int) -> bytearray:
+        """bytearray indexado por seq, com 1 para os itens dentro da faixa (somente leitura).
+
+        A última máscara fica guardada: ao digitar em outro campo ela é reaproveitada,
+        e ao mudar os limites desta faixa só as posições que entraram ou saíram mudam.
+        """
+        if self._ultima_mascara:
+            inicio_ant, fim_ant, tamanho_ant, total_ant, marcados = self._ultima_mascara
+            if tamanho_ant == tamanho and total_ant == len(self.chaves):
+                saem = [(inicio_ant, min(fim_ant, inicio)), (max(inicio_ant, fim), fim_ant)]
+                entram = [(inicio, min(fim, inicio_ant)), (max(inicio, fim_ant), fim)]
+                mudancas = sum(max(0, b - a) for a, b in saem + entram)
+                if mudancas <= min(fim - inicio, len(self.seqs) - (fim - inicio)):
+                    for a, b in saem:
+                        for seq in self.seqs[a:b]:
+                            marcados[seq] = 0
+                    for a, b in entram:
+                        for seq in self.seqs[a:b]:
+                            marcados[seq] = 1
+                    self._ultima_mascara = (inicio, fim, tamanho, total_ant, marcados)
+                    return marcados
+
+        if fim - inicio <= len(self.seqs) // 2:
+            marcados = bytearray(tamanho)
+            for seq in self.seqs[inicio:fim]:
+                marcados[seq] = 1
+        else:
+            # Faixa larga: parte de todos que têm o campo e desmarca o que ficou fora
+            marcados = bytearray(self.presentes)
+            marcados.extend(bytes(tamanho - len(marcados)))
+            for seq in self.seqs[:inicio] + self.seqs[fim:]:
+                marcados[seq] = 0
+        self._ultima_mascara = (inicio, fim, tamanho, len(self.chaves), marcados)
+        return marcados
+
+    def contem(self, seq: int, minimo, maximo) -> bool:
+        chave = self.por_seq.get(seq)
+        return chave is not None and (minimo is None or chave >= minimo) and (maximo is None or chave <= maximo)
+
+# Faixa informada no filtro, já resolvida em posições [inicio, fim) de um IndiceFaixa
+FaixaAtiva = collections.namedtuple('FaixaAtiva', 'quantidade indice inicio fim minimo maximo')
+
+class IndiceBoletos:
+    """Índices incrementais para busca e filtro rápidos sobre os resultados.
+
+    Cada item recebe um número sequencial (seq) na ordem de inserção. O índice
+    de n-gramas (1 a 3 caracteres) sobre o nome do arquivo e os dígitos da linha
+    digitável guarda listas de seq já ordenadas, então nenhum resultado precisa
+    ser reordenado. Valor e vencimento ficam em listas ordenadas para filtros
+    por faixa via bisect.
+    """
+
+    TAMANHO_NGRAMA = 3
+
+    def __init__(self):
+        self.limpar()
+
+    def limpar(self):
+        self.ngramas: Dict[str, array] = {}
+        self.itens: List[str] = []
+        self.ordem: Dict[str, int] = {}
+        self.nomes: List[str] = []
+        self.linhas: List[str] = []
+        self.faixas = {'valor': IndiceFaixa(), 'vencimento': IndiceFaixa()}
+        self._ultima_busca = None  # (termo_nome, termo_digitos, total de itens, seqs)
+
+    @staticmethod
+    def data_para_chave(texto) -> Optional[int]:
+        """Converte 'dd/mm/aaaa' em um inteiro aaaammdd ordenável"""
+        try:
+            data = datetime.strptime(str(texto).strip(), "%d/%m/%Y")
+        except ValueError:
+            return None
+        return data.year * 10000 + data.month * 100 + data.day
+
+    def _ngramas(self, texto: str, tamanhos=None) -> set:
+        tamanhos = tamanhos or range(1, self.TAMANHO_NGRAMA + 1)
+        return {texto[i:i + n] for n in tamanhos for i in range(len(texto) - n + 1)}
+
+    def adicionar(self, item_id: str, dados: Dict) -> int:
+        """Indexa um item e retorna o seu seq"""
+        seq = len(self.itens)
+        self.itens.append(item_id)
+        self.ordem[item_id] = seq
+        nome = str(dados.get('Arquivo', '')).lower()
+        linha = re.sub(r'\D', '', str(dados.get('Linha Digitável', '')))
+        self.nomes.append(nome)
+        self.linhas.append(linha)
+        for ngrama in self._ngramas(nome) | self._ngramas(linha):
+            lista = self.ngramas.get(ngrama)
+            if lista is None:
+                lista = self.ngramas[ngrama] = array('I')
+            lista.append(seq)
+
+        valor = dados.get('Valor')
+        chaves_item = {
+            'valor': float(valor) if isinstance(valor, (int, float)) else None,
+            'vencimento': self.data_para_chave(dados.get('Vencimento')),
+        }
+        for campo, chave in chaves_item.items():
+            self.faixas[campo].adicionar(seq, chave)
+        return seq
+
+    def _termos(self, termo: str) -> Tuple[str, str]:
+        """Normaliza a busca; fragmentos só com dígitos também casam com a linha digitável"""
+        termo_nome = termo.strip().lower()
+        termo_digitos = ''
+        if re.fullmatch(r'[\d.\s-]+', termo_nome):
+            termo_digitos = re.sub(r'\D', '', termo_nome)
+        return termo_nome, termo_digitos
+
+    def _filtrar_texto(self, seqs: Sequence[int], termo_nome: str, termo_digitos: str) -> List[int]:
+        """Verificação exata do texto sobre uma sequência de seq (mantém a ordem)"""
+        nomes, linhas = self.nomes, self.linhas
+        if termo_digitos:
+            return [s for s in seqs if termo_nome in nomes[s] or termo_digitos in linhas[s]]
+        return [s for s in seqs if termo_nome in nomes[s]]
+
+    def _candidatos(self, termo: str) -> Sequence[int]:
+        """Lista de seq mais curta entre os n-gramas do termo (exata se o termo tiver até 3 caracteres)"""
+        if len(termo) <= self.TAMANHO_NGRAMA:
+            return self.ngramas.get(termo, array('I'))
+        melhor = None
+        for ngrama in self._ngramas(termo, (self.TAMANHO_NGRAMA,)):
+            lista = self.ngramas.get(ngrama)
+            if not lista:
+                return array('I')
+            if melhor is None or len(lista) < len(melhor):
+                melhor = lista
+        return melhor
+
+    def _buscar_texto(self, termo_nome: str, termo_digitos: str) -> List[int]:
+        # Termo curto e sem forma alternativa em dígitos: a lista do n-grama já é o resultado
+        if termo_digitos in ('', termo_nome) and len(termo_nome) <= self.TAMANHO_NGRAMA:
+            return list(self._candidatos(termo_nome))
+
+        candidatos = self._candidatos(termo_nome)
+        if termo_digitos and termo_digitos != termo_nome:
+            # União de duas listas ordenadas, sem duplicatas e sem reordenar
+            candidatos = list(dict.fromkeys(heapq.merge(candidatos, self._candidatos(termo_digitos))))
+
+        # Se o termo só estende a busca anterior, basta estreitar o resultado anterior
+        if self._ultima_busca:
+            nome_ant, digitos_ant, total_ant, seqs_ant = self._ultima_busca
+            if nome_ant in termo_nome and (not termo_digitos or (digitos_ant and digitos_ant in termo_digitos)):
+                if len(seqs_ant) + len(self.itens) - total_ant < len(candidatos):
+                    candidatos = seqs_ant + list(range(total_ant, len(self.itens)))
+        return self._filtrar_texto(candidatos, termo_nome, termo_digitos)
+
+    def _faixas_ativas(self, valor_min, valor_max, venc_min, venc_max) -> List[FaixaAtiva]:
+        """Faixas informadas, da mais seletiva para a menos"""
+        faixas = []
+        for campo, minimo, maximo in (('valor', valor_min, valor_max), ('vencimento', venc_min, venc_max)):
+            if minimo is None and maximo is None:
+                continue
+            inicio, fim = self.faixas[campo].limites(minimo, maximo)
+            faixas.append(FaixaAtiva(fim - inicio, self.faixas[campo], inicio, fim, minimo, maximo))
+        faixas.sort(key=lambda f: f.quantidade)
+        return faixas
+
+    def _mascara_faixas(self, faixas: List[FaixaAtiva]) -> bytearray:
+        """Interseção das máscaras de todas as faixas informadas"""
+        tamanho = len(self.itens)
+        mascara = None
+        for faixa in faixas:
+            atual = faixa.indice.mascara(faixa.inicio, faixa.fim, tamanho)
+            if mascara is None:
+                mascara = atual
+            else:
+                # AND byte a byte feito de uma vez, convertendo as máscaras em inteiros
+                juntos = int.from_bytes(mascara, 'little') & int.from_bytes(atual, 'little')
+                mascara = bytearray(juntos.to_bytes(tamanho, 'little'))
+        return mascara
+
+    def filtrar(self, termo: str = '', valor_min=None, valor_max=None,
+                venc_min=None, venc_max=None) -> Optional[List[int]]:
+        """Retorna os seq que atendem ao filtro, na ordem de inserção (None = sem filtro)"""
+        faixas = self._faixas_ativas(valor_min, valor_max, venc_min, venc_max)
+        termo_nome, termo_digitos = self._termos(termo)
+        if not faixas and not termo_nome:
+            return None
+
+        # Começa pelo índice mais seletivo; o outro critério só verifica os candidatos
+        if faixas and (not termo_nome or faixas[0].quantidade <= len(self._candidatos(termo_nome))):
+            mascara = self._mascara_faixas(faixas)
+            resultado = list(itertools.compress(range(len(mascara)), mascara))
+            if termo_nome:
+                resultado = self._filtrar_texto(resultado, termo_nome, termo_digitos)
+            return resultado
+
+        resultado = self._buscar_texto(termo_nome, termo_digitos)
+        self._ultima_busca = (termo_nome, termo_digitos, len(self.itens), resultado)
+        if faixas and len(resultado) * 8 < faixas[0].quantidade:
+            # Poucos candidatos: conferir um a um sai mais barato que montar as máscaras
+            for faixa in faixas:
+                resultado = [s for s in resultado if faixa.indice.contem(s, faixa.minimo, faixa.maximo)]
+        elif faixas:
+            mascara = self._mascara_faixas(faixas)
+            resultado = [s for s in resultado if mascara[s]]
+        return resultado
+
+    def corresponde(self, item_id: str, termo: str = '', valor_min=None, valor_max=None,
+                    venc_min=None, venc_max=None) -> bool:
+        """Verifica um único item contra o filtro (usado para resultados novos)"""
+        seq = self.ordem[item_id]
+        termo_nome, termo_digitos = self._termos(termo)
+        if termo_nome and not self._filtrar_texto((seq,), termo_nome, termo_digitos):
+            return False
+        for campo, minimo, maximo in (('valor', valor_min, valor_max), ('vencimento', venc_min, venc_max)):
+            if (minimo is not None or maximo is not None) and not self.faixas[campo].contem(seq, minimo, maximo):
+                return False
+        return True
+
+class AgendadorArquivos:
+    """Estima o custo de cada arquivo e define a ordem de processamento.
+
+    O custo é o tamanho em KB de PDF, obtido só com stat: abrir cada PDF para
+    contar páginas e imagens atrasaria o primeiro resultado em lotes grandes.
+    Para caixas de e-mail, estima-se o PDF contido descontando o base64.
+    """
+
+    POLITICAS = {
+        'Ordem da pasta': 'pasta',
+        'Menores primeiro (resultados rápidos)': 'menor',
+        'Maiores primeiro (menor tempo total)': 'maior',
+        'Mais antigos primeiro': 'antigo',
+    }
+
+    def estimar_custo(self, tamanho: int, tipo: str = 'pdf') -> float:
+        if tipo == 'email':
+            tamanho = tamanho * 3 / 4  # base64 ocupa ~4/3 do conteúdo original
+        return max(tamanho / 1024, 1.0)
+
+    def planejar(self, pasta: str, politica: str = 'pasta', incluir_emails: bool = False) -> List[Dict]:
+        """Retorna as tarefas (arquivo, caminho, tipo, custo, mtime) na ordem da política"""
+        tarefas = []
+        with os.scandir(pasta) as entradas:
+            for entrada in entradas:
+                nome_arquivo = entrada.name
+                if nome_arquivo.lower().endswith('.pdf'):
+                    tipo = 'pdf'
+                elif incluir_emails and nome_arquivo.lower().endswith(LeitorEmails.EXTENSOES):
+                    # Anexos só são conhecidos ao ler a caixa; o custo é acertado ao fim dela
+                    tipo = 'email'
+                else:
+                    continue
+                try:
+                    info = entrada.stat()
+                    tamanho, mtime = info.st_size, info.st_mtime
+                except OSError:
+                    # Ex.: link simbólico quebrado; a extração gera a linha de erro desse arquivo
+                    tamanho, mtime = 0, 0.0
+                tarefas.append({
+                    'arquivo': nome_arquivo,
+                    'caminho': entrada.path,
+                    'tipo': tipo,
+                    'custo': self.estimar_custo(tamanho, tipo),
+                    'mtime': mtime,
+                })
+
+        if politica == 'menor':
+            tarefas.sort(key=lambda t: t['custo'])
+        elif politica == 'maior':
+            tarefas.sort(key=lambda t: t['custo'], reverse=True)
+        elif politica == 'antigo':
+            tarefas.sort(key=lambda t: t['mtime'])
+        return tarefas
+
+class LeitorEmails:
+    """Extrai anexos PDF de arquivos .eml e exportações .mbox.
+
+    Exportações .mbox são lidas linha a linha e cada mensagem é entregue ao
+    parser assim que termina, então só uma mensagem fica em memória por vez.
+    """
+
+    EXTENSOES = ('.eml', '.mbox')
+    TAMANHO_BLOCO = 64 * 1024
+
+    def _novo_parser(self) -> BytesFeedParser:
+        return BytesFeedParser(policy=email.policy.default)
+
+    def _mensagens(self, caminho: str):
+        """Gera cada e-mail do arquivo, um de cada vez"""
+        with open(caminho, 'rb') as arquivo:
+            if caminho.lower().endswith('.eml'):
+                parser = self._novo_parser()
+                for bloco in iter(lambda: arquivo.read(self.TAMANHO_BLOCO), b''):
+                    parser.feed(bloco)
+                yield parser.close()
+                return
+
+            parser = None
+            linha_anterior_vazia = True
+            for linha in arquivo:
+                # Uma nova mensagem começa em "From " no início do arquivo ou após linha vazia
+                if linha.startswith(b'From ') and linha_anterior_vazia:
+                    if parser is not None:
+                        yield parser.close()
+                    parser = self._novo_parser()
+                    linha_anterior_vazia = False
+                    continue
+                if parser is not None:
+                    if re.match(rb'>+From ', linha):
+                        linha = linha[1:]  # Desfaz o escape ">From " do formato mboxrd
+                    parser.feed(linha)
+                linha_anterior_vazia = linha in (b'\n', b'\r\n')
+            if parser is not None:
+                yield parser.close()
+
+    @staticmethod
+    def _data_mensagem(mensagem) -> str:
+        try:
+            data = getattr(mensagem['Date'], 'datetime', None)
+        except Exception:
+            data = None
+        return data.strftime("%d/%m/%Y %H:%M") if data else 'Não informada'
+
+    def anexos_pdf(self, caminho: str):
+        """Gera um dict por anexo PDF: nome, conteudo, remetente e data"""
+        for mensagem in self._mensagens(caminho):
+            try:
+                remetente = str(mensagem['From'] or 'Não informado')
+            except Exception:
+                remetente = 'Não informado'
+            data = self._data_mensagem(mensagem)
+
+            for parte in mensagem.walk():
+                if parte.is_multipart():
+                    continue
+                nome = parte.get_filename() or ''
+                if parte.get_content_type() != 'application/pdf' and not nome.lower().endswith('.pdf'):
+                    continue
+                conteudo = parte.get_payload(decode=True)
+                if not conteudo:
+                    continue
+                yield {
+                    'nome': os.path.basename(nome) or 'anexo.pdf',
+                    'conteudo': conteudo,
+                    'remetente': remetente,
+                    'data': data,
+                }
+
+class ExtratorBoletos:
+    """Extração de dados de boletos, independente da interface gráfica.
+
+    Pode ser instanciada diretamente em processos de trabalho (modo de memória
+    controlada), onde não existe Tk.
+    """
+
+    def __init__(self, salvar_texto_bruto: bool = True):
+        self.salvar_texto_bruto = salvar_texto_bruto
+
+    # === MÉTODOS DE EXTRAÇÃO APRIMORADOS ===
+    
+    def extrair_qrcode_do_pdf(self, doc: fitz.Document) -> Optional[str]:
+        if not QR_CODE_DISPONIVEL:
+            return "Dependências não instaladas"
+        
+        todos_qrcodes_encontrados = []
+        for pagina in doc:
+            for img in pagina.get_images(full=True):
+                xref = img[0]
+                image_bytes = doc.extract_image(xref)["image"]
+                try:
+                    # O 'with' libera o buffer decodificado assim que a leitura termina
+                    with Image.open(io.BytesIO(image_bytes)) as pil_image:
+                        for qr in decode(pil_image):
+                            todos_qrcodes_encontrados.append(qr.data.decode("utf-8"))
+                except Exception:
+                    continue
+        if not todos_qrcodes_encontrados:
+            return None
+        for qr_text in todos_qrcodes_encontrados:
+            if qr_text.startswith("000201"):
+                return qr_text
+        return todos_qrcodes_encontrados[0]
+
+    def extrair_valor_inteligente(self, texto: str, qr_code: str = None) -> Tuple[Optional[float], str]:
+        """Extração inteligente de valores com múltiplas estratégias"""
+        # 1. Tenta extrair do QR Code primeiro (mais confiável)
+        if qr_code and qr_code != 'Não encontrado':
+            try:
+                match_valor_qr = re.search(r'54\d{2}(\d+\.\d{2})', qr_code)
+                if match_valor_qr:
+                    valor = float(match_valor_qr.group(1))
+                    if 0.01 <= valor <= 999999.99:
+                        return valor, 'QR Code PIX'
+            except (ValueError, AttributeError):
+                pass
+        
+        # 2. Se não achou no QR, busca no texto
+        padroes_valor = [
+            (r'(?:VALOR\s+TOTAL|TOTAL\s+A\s+PAGAR|VALOR\s+DO\s+DOCUMENTO)\s*:?\s*R?\$?\s*([\d.,]+)', 'PDF - Campo Específico'),
+            (r'(\d{1,3}(?:\.\d{3})*,\d{2})', 'PDF - Formato Monetário'),
+        ]
+        
+        valores_encontrados = []
+        for padrao, fonte in padroes_valor:
+            matches = re.findall(padrao, texto, re.IGNORECASE)
+            for match in matches:
+                try:
+                    valor_limpo = match.replace('.', '').replace(',', '.')
+                    valor = float(valor_limpo)
+                    if 0.01 <= valor <= 999999.99:
+                        valores_encontrados.append(valor)
+                except ValueError:
+                    continue
+        
+        # 3. Heurística: se encontrou múltiplos valores, pega o maior (geralmente o total)
+        if valores_encontrados:
+            return max(valores_encontrados), 'PDF - Maior Valor'
+        
+        return None, 'Não encontrado'
+
+    def extrair_data_vencimento_inteligente(self, texto: str, qr_code: str = None) -> Tuple[Optional[str], str]:
+        """Extração inteligente de data de vencimento com múltiplas estratégias"""
+        datas_candidatas = []
+        padrao_data = re.finditer(r'(\d{1,2}[/.\-]\d{1,2}[/.\-]\d{4})', texto)
+        
+        for match in padrao_data:
+            data_str = match.group(1)
+            posicao = match.start()
+            try:
+                data_normalizada = data_str.replace('.', '/').replace('-', '/')
+                partes = data_normalizada.split('/')
+                if len(partes) == 3:
+                    dia, mes, ano = int(partes[0]), int(partes[1]), int(partes[2])
+                    if 1 <= dia <= 31 and 1 <= mes <= 12 and 2000 <= ano <= 2050:
+                        datas_candidatas.append({'data': data_normalizada, 'posicao': posicao})
+            except (ValueError, TypeError):
+                continue
+        
+        # 1. Tenta extrair do QR Code primeiro
+        if qr_code and qr_code != 'Não encontrado':
+            try:
+                match_venc_qr = re.search(r'Venc[.:]\s*(\d{1,2}[./]\d{1,2}[./]\d{4})', qr_code, re.IGNORECASE)
+                if match_venc_qr:
+                    return match_venc_qr.group(1).replace('.', '/'), 'QR Code'
+            except AttributeError:
+                pass
+        
+        if not datas_candidatas:
+            return None, 'Não encontrado'
+        
+        # 2. Procura por palavras-chave
+        palavras_vencimento = [r'VENCIMENTO', 'VENC.', 'VENC:', 'PAGAR ATÉ', 'DATA LIMITE', 'DATA DE VENCIMENTO']
+        for data_info in datas_candidatas:
+            inicio_contexto = max(0, data_info['posicao'] - 50)
+            contexto = texto[inicio_contexto:data_info['posicao']]
+            for palavra in palavras_vencimento:
+                if re.search(palavra, contexto, re.IGNORECASE):
+                    return data_info['data'], f'PDF - Contexto ({palavra})'
+        
+        # 3. Pega a última data do documento
+        return datas_candidatas[-1]['data'], 'PDF - Última Encontrada'
+
+    def extrair_linha_digitavel_melhorada(self, texto: str) -> Tuple[Optional[str], str]:
+        """
+        Extração definitiva da linha digitável, tentando os padrões mais comuns em ordem.
+        """
+        # 1. Tenta o padrão de Boleto Bancário (47 dígitos, mais complexo e específico)
+        #    Usa s* para aceitar "zero ou mais espaços", corrigindo a regressão.
+        padrao_bancario = re.compile(r'(\d{5}\.?\d{5}\s*?\d{5}\.?\d{6}\s*?\d{5}\.?\d{6}\s*?\d\s*?\d{14})')
+        match = padrao_bancario.search(texto)
+        if match:
+            return match.group(1).strip(), 'PDF - Boleto Bancário'
+
+        # 2. Se não achou, tenta o padrão de Conta Convênio (48 dígitos)
+        #    Este geralmente tem espaços, então usamos s+ (um ou mais espaços).
+        padrao_convenio = re.compile(r'(\d{11,12}\s+\d{11,12}\s+\d{11,12}\s+\d{11,12})')
+        match = padrao_convenio.search(texto)
+        if match:
+            return match.group(1).strip(), 'PDF - Conta Convênio'
+            
+        return None, 'Não encontrado'
+
+    def extrair_dados_boleto_avancado(self, caminho_pdf: str, conteudo: Optional[bytes] = None) -> Optional[Dict[str, str]]:
+        """Versão aprimorada da extração com análise inteligente.
+
+        Se 'conteudo' for informado, o PDF é lido da memória (ex.: anexo de
+        e-mail) e 'caminho_pdf' serve apenas como nome do arquivo.
+        """
+        nome_arquivo = os.path.basename(caminho_pdf)
+        try:
+            if conteudo is not None:
+                doc = fitz.open(stream=conteudo, filetype="pdf")
+            else:
+                doc = fitz.open(caminho_pdf)
+            total_paginas = len(doc)
+        except Exception as e:
+            return {"Arquivo": nome_arquivo, "Erro": str(e), "Status": "Erro", "Total_Paginas": 0}
+
+        # O documento é sempre fechado, mesmo quando a extração falha no meio
+        try:
+            return self._extrair_dados_documento(doc, nome_arquivo, total_paginas)
+        except Exception as e:
+            return {"Arquivo": nome_arquivo, "Erro": str(e), "Status": "Erro", "Total_Paginas": total_paginas}
+        finally:
+            doc.close()
+
+    def _extrair_dados_documento(self, doc: fitz.Document, nome_arquivo: str, total_paginas: int) -> Dict[str, str]:
+        textos_por_pagina = [{'numero': i+1, 'texto': p.get_text("text")} for i, p in enumerate(doc)]
+        texto_completo = "\n\n--- PÁGINA {} ---\n\n".format(textos_por_pagina[0]['numero']).join([p['texto'] for p in textos_por_pagina])
+
+        dados_boleto = {
+            "Arquivo": nome_arquivo, "Total_Paginas": total_paginas,
+            "Linha Digitável": "Não encontrado", "Valor": "Não encontrado",
+            "Vencimento": "Não encontrado", "QR Code": "Não encontrado", "Status": "Erro"
+        }
+        if self.salvar_texto_bruto:
+            dados_boleto["Texto_Bruto"] = texto_completo
+
+        # Extrações
+        qr_code = self.extrair_qrcode_do_pdf(doc)
+        if qr_code: dados_boleto["QR Code"] = qr_code
+
+        linha, fonte_linha = self.extrair_linha_digitavel_melhorada(texto_completo)
+        if linha: dados_boleto["Linha Digitável"], dados_boleto["Fonte_Linha"] = linha, fonte_linha
+
+        valor, fonte_valor = self.extrair_valor_inteligente(texto_completo, qr_code)
+        if valor: dados_boleto["Valor"], dados_boleto["Fonte_Valor"] = valor, fonte_valor
+
+        vencimento, fonte_vencimento = self.extrair_data_vencimento_inteligente(texto_completo, qr_code)
+        if vencimento: dados_boleto["Vencimento"], dados_boleto["Fonte_Vencimento"] = vencimento, fonte_vencimento
+
+        # Determina status final
+        campos_ok = sum(1 for k in ["Linha Digitável", "Valor", "Vencimento"] if dados_boleto[k] != "Não encontrado")
+        if campos_ok >= 3:
+            dados_boleto["Status"] = "Completo"
+        elif campos_ok >= 1:
+            dados_boleto["Status"] = "Parcial"
+        else:
+            dados_boleto["Status"] = "Não Encontrado"
+
+        if not self.salvar_texto_bruto:
+            for k in ["Fonte_Linha", "Fonte_Valor", "Fonte_Vencimento", "Texto_Bruto"]:
+                dados_boleto.pop(k, None)
+        
+        return dados_boleto
+
+MB = 1024 * 1024
+
+def medir_memoria_mb() -> Tuple[Optional[float], Optional[float]]:
+    """Retorna (RSS atual, pico de RSS) do processo em MB; (None, None) se não for possível medir"""
+    try:
+        if os.name == 'nt':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            contadores = PROCESS_MEMORY_COUNTERS()
+            contadores.cb = ctypes.sizeof(contadores)
+            # Tipos declarados nas duas funções: sem argtypes, o HANDLE de 64 bits seria truncado
+            kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+            psapi = ctypes.WinDLL('psapi', use_last_error=True)
+            kernel32.GetCurrentProcess.argtypes = []
+            kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+            psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+            psapi.GetProcessMemoryInfo.restype = wintypes.BOOL
+            if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(contadores), contadores.cb):
+                return None, None
+            return contadores.WorkingSetSize / MB, contadores.PeakWorkingSetSize / MB
+
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        pico_mb = pico / MB if sys.platform == 'darwin' else pico / 1024  # macOS em bytes, Linux em KB
+        try:
+            with open('/proc/self/statm') as f:
+                atual_mb = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+        except OSError:
+            atual_mb = pico_mb
+        return atual_mb, pico_mb
+    except (ImportError, OSError, AttributeError, ValueError):
+        return None, None
+
+def limitar_store_mupdf(limite_mb: int) -> None:
+    """Esvazia o cache interno do MuPDF quando ele passa do limite"""
+    if limite_mb and fitz.TOOLS.store_size > limite_mb * MB:
+        fitz.TOOLS.store_shrink(100)
+
+def worker_extracao(conexao, salvar_texto_bruto: bool, max_arquivos: int,
+                    limite_rss_mb: int, limite_store_mb: int) -> None:
+    """Processo de trabalho do modo de memória controlada.
+
+    Recebe (índice, caminho, conteúdo) pelo próprio Pipe, um de cada vez, até receber None
+    ou atingir max_arquivos / limite_rss_mb, quando encerra para ser reciclado.
+    Cada resultado diz se o worker aceita outra tarefa, então o supervisor sempre
+    sabe qual arquivo está com qual processo. Ao sair, informa quantos arquivos
+    processou e o pico de memória (None se não foi possível medir).
+    """
+    extrator = ExtratorBoletos(salvar_texto_bruto)
+    arquivos = 0
+    motivo = 'fim'
+    while True:
+        item = conexao.recv()
+        if item is None:
+            break
+        indice, caminho, conteudo = item
+        dados = extrator.extrair_dados_boleto_avancado(caminho, conteudo)
+        limitar_store_mupdf(limite_store_mb)
+        arquivos += 1
+
+        memoria_atual, _ = medir_memoria_mb()
+        acima_do_limite = bool(limite_rss_mb) and memoria_atual is not None and memoria_atual > limite_rss_mb
+        continuar = not ((max_arquivos and arquivos >= max_arquivos) or acima_do_limite)
+        conexao.send(('resultado', indice, dados, continuar))
+        if not continuar:
+            motivo = 'reciclado'
+            break
+    _, pico = medir_memoria_mb()
+    conexao.send(('saida', arquivos, pico, motivo))
+    conexao.close()
+
+class ExtratorBoletosGUI(ExtratorBoletos):
     def __init__(self, root):
+        super().__init__()
         self.root = root
         self.root.title("🧾 Extrator de Dados de Boletos - v1")
         self.root.geometry("900x700")
@@ -85,6 +740,36 @@ class ExtratorBoletosGUI:
         ttk.Checkbutton(opcoes_frame, text="💾 Salvar dados brutos para debug", 
                         variable=self.var_backup_dados).grid(row=1, column=0, sticky=tk.W)
         
+        self.var_ler_emails = tk.BooleanVar(value=False)
+        ttk.Checkbutton(opcoes_frame, text="📧 Ler anexos PDF de e-mails (.eml/.mbox) na pasta", 
+                        variable=self.var_ler_emails).grid(row=2, column=0, sticky=tk.W)
+        
+        ordem_frame = ttk.Frame(opcoes_frame)
+        ordem_frame.grid(row=3, column=0, sticky=tk.W, pady=(5, 0))
+        ttk.Label(ordem_frame, text="📶 Ordem de processamento:").grid(row=0, column=0, padx=(0, 10))
+        self.var_politica = tk.StringVar(value=next(iter(AgendadorArquivos.POLITICAS)))
+        ttk.Combobox(ordem_frame, textvariable=self.var_politica, state='readonly', width=38,
+                     values=list(AgendadorArquivos.POLITICAS)).grid(row=0, column=1)
+        
+        memoria_frame = ttk.Frame(opcoes_frame)
+        memoria_frame.grid(row=4, column=0, sticky=tk.W, pady=(5, 0))
+        self.var_modo_memoria = tk.BooleanVar(value=False)
+        self.var_workers = tk.IntVar(value=max(1, (os.cpu_count() or 2) - 1))
+        self.var_arquivos_por_worker = tk.IntVar(value=200)
+        self.var_limite_rss = tk.IntVar(value=700)
+        self.var_limite_store = tk.IntVar(value=64)
+        ttk.Checkbutton(memoria_frame, text="🧠 Memória controlada (processos reciclados)",
+                        variable=self.var_modo_memoria).grid(row=0, column=0, padx=(0, 10))
+        campos_memoria = [
+            ("Workers:", self.var_workers, 1, 64),
+            ("Arquivos/worker:", self.var_arquivos_por_worker, 1, 100000),
+            ("RSS máx. (MB):", self.var_limite_rss, 100, 65536),
+            ("Cache MuPDF (MB):", self.var_limite_store, 8, 4096),
+        ]
+        for i, (rotulo, var, minimo, maximo) in enumerate(campos_memoria):
+            ttk.Label(memoria_frame, text=rotulo).grid(row=0, column=1 + 2 * i, padx=(5, 3))
+            ttk.Spinbox(memoria_frame, textvariable=var, from_=minimo, to=maximo, width=6).grid(row=0, column=2 + 2 * i)
+        
         # Frame de controles
         controles_frame = ttk.Frame(main_frame)
         controles_frame.grid(row=3, column=0, columnspan=3, pady=(0, 15))
@@ -117,9 +802,37 @@ class ExtratorBoletosGUI:
         resultados_frame = ttk.LabelFrame(main_frame, text="Resultados", padding="10")
         resultados_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 15))
         resultados_frame.columnconfigure(0, weight=1)
-        resultados_frame.rowconfigure(0, weight=1)
+        resultados_frame.rowconfigure(1, weight=1)
         main_frame.rowconfigure(5, weight=1)
         
+        # Barra de busca e filtros
+        filtro_frame = ttk.Frame(resultados_frame)
+        filtro_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        filtro_frame.columnconfigure(1, weight=1)
+        
+        self.var_busca = tk.StringVar()
+        self.var_valor_min = tk.StringVar()
+        self.var_valor_max = tk.StringVar()
+        self.var_venc_min = tk.StringVar()
+        self.var_venc_max = tk.StringVar()
+        
+        ttk.Label(filtro_frame, text="🔎 Buscar:").grid(row=0, column=0, padx=(0, 5))
+        ttk.Entry(filtro_frame, textvariable=self.var_busca).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(0, 10))
+        ttk.Label(filtro_frame, text="Valor de").grid(row=0, column=2, padx=(0, 5))
+        ttk.Entry(filtro_frame, textvariable=self.var_valor_min, width=9).grid(row=0, column=3)
+        ttk.Label(filtro_frame, text="até").grid(row=0, column=4, padx=5)
+        ttk.Entry(filtro_frame, textvariable=self.var_valor_max, width=9).grid(row=0, column=5, padx=(0, 10))
+        ttk.Label(filtro_frame, text="Venc. de").grid(row=0, column=6, padx=(0, 5))
+        ttk.Entry(filtro_frame, textvariable=self.var_venc_min, width=10).grid(row=0, column=7)
+        ttk.Label(filtro_frame, text="até").grid(row=0, column=8, padx=5)
+        ttk.Entry(filtro_frame, textvariable=self.var_venc_max, width=10).grid(row=0, column=9, padx=(0, 10))
+        ttk.Button(filtro_frame, text="✖", width=3, command=self.limpar_filtro).grid(row=0, column=10)
+        self.label_filtro = ttk.Label(filtro_frame, text="", font=('Arial', 9))
+        self.label_filtro.grid(row=1, column=0, columnspan=11, sticky=tk.W, pady=(5, 0))
+        
+        for var in (self.var_busca, self.var_valor_min, self.var_valor_max, self.var_venc_min, self.var_venc_max):
+            var.trace_add('write', self.agendar_filtro)
+        
         # Treeview para mostrar os resultados
         colunas = ('Arquivo', 'Linha Digitável', 'Valor', 'Vencimento', 'QR Code', 'Status', 'Páginas')
         self.tree = ttk.Treeview(resultados_frame, columns=colunas, show='headings', height=12)
@@ -144,9 +857,9 @@ class ExtratorBoletosGUI:
         scrollbar_h = ttk.Scrollbar(resultados_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
         self.tree.configure(yscrollcommand=scrollbar_v.set, xscrollcommand=scrollbar_h.set)
         
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar_v.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        scrollbar_h.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar_v.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        scrollbar_h.grid(row=2, column=0, sticky=(tk.W, tk.E))
         
         # Tags para colorir linhas baseado no status
         self.tree.tag_configure('sucesso', background='#d4edda')
@@ -174,6 +887,9 @@ class ExtratorBoletosGUI:
         
         self.configurar_estilo()
         self.dados_completos = {}
+        self.indice = IndiceBoletos()
+        self.filtro_ativo = None
+        self.visiveis: List[int] = []  # seq dos itens exibidos, na ordem da Treeview
         self.verificar_queue()
     
     def configurar_estilo(self):
@@ -186,8 +902,13 @@ class ExtratorBoletosGUI:
         if pasta:
             self.pasta_selecionada.set(pasta)
             try:
-                pdfs = [f for f in os.listdir(pasta) if f.lower().endswith('.pdf')]
-                self.status_atual.set(f"Pasta selecionada: {len(pdfs)} arquivos PDF encontrados")
+                arquivos = os.listdir(pasta)
+                pdfs = [f for f in arquivos if f.lower().endswith('.pdf')]
+                emails = [f for f in arquivos if f.lower().endswith(LeitorEmails.EXTENSOES)]
+                status = f"Pasta selecionada: {len(pdfs)} arquivos PDF encontrados"
+                if emails:
+                    status += f", {len(emails)} arquivos de e-mail (.eml/.mbox)"
+                self.status_atual.set(status)
             except Exception as e:
                 messagebox.showerror("Erro", f"Não foi possível acessar a pasta:\n{e}")
 
@@ -198,43 +919,260 @@ class ExtratorBoletosGUI:
         if not os.path.isdir(self.pasta_selecionada.get()):
             messagebox.showerror("Erro", "A pasta selecionada não existe!")
             return
+        config = self.ler_configuracao()
+        if config is None:
+            return
         self.btn_processar.config(state='disabled')
         self.limpar_resultados()
-        thread = threading.Thread(target=self.processar_boletos_thread, daemon=True)
+        thread = threading.Thread(target=self.processar_boletos_thread, args=(config,), daemon=True)
         thread.start()
 
-    def processar_boletos_thread(self):
+    def ler_configuracao(self) -> Optional[Dict]:
+        """Lê e valida as opções na thread da interface (variáveis Tk não são seguras em outras threads)"""
+        config = {
+            'pasta': self.pasta_selecionada.get(),
+            'politica': AgendadorArquivos.POLITICAS.get(self.var_politica.get(), 'pasta'),
+            'ler_emails': self.var_ler_emails.get(),
+            'modo_memoria': self.var_modo_memoria.get(),
+            'salvar_texto_bruto': self.var_backup_dados.get(),
+        }
+        campos_numericos = [
+            ('workers', "Workers", self.var_workers, 1),
+            ('arquivos_por_worker', "Arquivos/worker", self.var_arquivos_por_worker, 1),
+            ('limite_rss_mb', "RSS máx. (MB)", self.var_limite_rss, 100),
+            ('limite_store_mb', "Cache MuPDF (MB)", self.var_limite_store, 8),
+        ]
+        for chave, rotulo, var, minimo in campos_numericos:
+            try:
+                valor = var.get()
+            except (tk.TclError, ValueError):
+                valor = None
+            if valor is None or valor < minimo:
+                messagebox.showerror("Erro", f"Valor inválido em '{rotulo}': informe um número inteiro a partir de {minimo}.")
+                return None
+            config[chave] = valor
+        return config
+
+    def processar_boletos_thread(self, config: Dict):
         try:
-            pasta = self.pasta_selecionada.get()
-            arquivos_pdf = [f for f in os.listdir(pasta) if f.lower().endswith('.pdf')]
-            total_arquivos = len(arquivos_pdf)
-            if total_arquivos == 0:
+            pasta = config['pasta']
+            self.queue.put(('progresso', 0, "Listando arquivos..."))
+            tarefas = AgendadorArquivos().planejar(pasta, config['politica'], config['ler_emails'])
+            if not tarefas:
                 self.queue.put(('erro', "Nenhum arquivo PDF encontrado na pasta!"))
                 self.queue.put(('fim', None))
                 return
+            # Com e-mails, o total de boletos só é conhecido ao fim da leitura
+            tem_emails = any(t['tipo'] == 'email' for t in tarefas)
+            total_arquivos = None if tem_emails else len(tarefas)
             
+            self.memoria_workers = {}
+            unidades = self._unidades_de_trabalho(tarefas)
+            if config['modo_memoria']:
+                execucao = self._executar_em_workers(unidades, config)
+            else:
+                execucao = self._executar_sequencial(unidades, config)
+            
+            # Progresso ponderado pelo custo estimado, não pela contagem de arquivos
+            custo_total = sum(t['custo'] for t in tarefas)
+            custo_concluido = 0.0
             boletos_processados = []
-            for i, nome_arquivo in enumerate(arquivos_pdf):
-                caminho_completo = os.path.join(pasta, nome_arquivo)
-                progresso = ((i + 1) / total_arquivos) * 100
-                self.queue.put(('progresso', progresso, f"Processando ({i+1}/{total_arquivos}): {nome_arquivo}"))
-                
-                dados = self.extrair_dados_boleto_avancado(caminho_completo)
+            for tarefa, dados in execucao:
+                if tarefa['custo'] < 0:
+                    custo_total -= tarefa['custo']  # Caixa com mais PDF que o estimado
+                else:
+                    custo_concluido += tarefa['custo']
+                progresso = min(100, (custo_concluido / custo_total) * 100)
+                if dados and 'extras' in tarefa:
+                    dados.update(tarefa['extras'])
                 if dados:
                     boletos_processados.append(dados)
                     self.queue.put(('resultado', dados))
+                contador = len(boletos_processados) if total_arquivos is None else f"{len(boletos_processados)}/{total_arquivos}"
+                self.queue.put(('progresso', progresso, f"Processado ({contador}): {tarefa['arquivo']}"))
+            
+            if total_arquivos is None:
+                total_arquivos = len(boletos_processados)
             
-            self.queue.put(('progresso', 100, f"Processamento concluído! {len(boletos_processados)} de {total_arquivos} boletos analisados."))
+            mensagem = f"Processamento concluído! {len(boletos_processados)} de {total_arquivos} boletos analisados."
+            if self.memoria_workers:
+                picos = ", ".join(
+                    f"W{wid}: {'memória não pôde ser medida' if r['pico_mb'] is None else format(r['pico_mb'], '.0f') + ' MB'} "
+                    f"({r['arquivos']} arq., {r['reciclagens']} recicl.)"
+                    for wid, r in sorted(self.memoria_workers.items()))
+                mensagem += f" | Pico de memória - {picos}"
+            self.queue.put(('progresso', 100, mensagem))
             
             if boletos_processados:
-                self.salvar_resultados(pasta, boletos_processados)
+                self.salvar_resultados(pasta, boletos_processados, config['salvar_texto_bruto'])
                 
         except Exception as e:
             self.queue.put(('erro', f"Erro durante processamento: {str(e)}"))
         finally:
             self.queue.put(('fim', None))
 
-    def salvar_resultados(self, pasta: str, dados: List[Dict]) -> None:
+    def _unidades_de_trabalho(self, tarefas: List[Dict]):
+        """Expande as tarefas em unidades de extração, na ordem da política.
+
+        Cada PDF é uma unidade. Caixas de e-mail são lidas sob demanda e geram uma
+        unidade por anexo, com o conteúdo em memória, o custo em KB do PDF e, em
+        'extras', o nome qualificado pela caixa, a caixa de origem e remetente/data. Unidades com 'pronto' já trazem o resultado
+        (erro de leitura ou acerto de custo ao fim da caixa) e não são extraídas.
+        """
+        leitor = LeitorEmails()
+        for tarefa in tarefas:
+            if tarefa['tipo'] == 'pdf':
+                yield tarefa
+                continue
+            consumido = 0.0
+            try:
+                for anexo in leitor.anexos_pdf(tarefa['caminho']):
+                    custo = len(anexo['conteudo']) / 1024
+                    consumido += custo
+                    rotulo = f"{tarefa['arquivo']} › {anexo['nome']}"
+                    yield {
+                        'arquivo': rotulo,
+                        'caminho': anexo['nome'],
+                        'conteudo': anexo['conteudo'],
+                        'custo': custo,
+                        'extras': {
+                            # Qualificado pela caixa: anexos homônimos ficam distinguíveis e a busca acha pela caixa
+                            "Arquivo": rotulo,
+                            "Email_Origem": tarefa['arquivo'],
+                            "Remetente": anexo['remetente'],
+                            "Data_Email": anexo['data'],
+                        },
+                    }
+            except Exception as e:
+                yield {'arquivo': tarefa['arquivo'], 'custo': 0.0, 'pronto': {
+                    "Arquivo": tarefa['arquivo'], "Erro": f"Erro ao ler e-mails: {e}", "Status": "Erro", "Total_Paginas": 0}}
+            # Troca a estimativa da caixa pelo que os anexos realmente somaram
+            yield {'arquivo': tarefa['arquivo'], 'custo': tarefa['custo'] - consumido, 'pronto': None}
+
+    def _executar_sequencial(self, unidades, config: Dict):
+        # Extrator próprio da execução: a thread não altera o estado da interface
+        extrator = ExtratorBoletos(config['salvar_texto_bruto'])
+        for unidade in unidades:
+            if 'pronto' in unidade:
+                yield unidade, unidade['pronto']
+                continue
+            dados = extrator.extrair_dados_boleto_avancado(unidade['caminho'], unidade.get('conteudo'))
+            limitar_store_mupdf(config['limite_store_mb'])
+            yield unidade, dados
+
+    def _executar_em_workers(self, unidades, config: Dict):
+        """Distribui as unidades entre processos reciclados e devolve (unidade, dados) na ordem de conclusão.
+
+        Cada unidade é entregue pelo Pipe do worker (anexos de e-mail vão com o
+        conteúdo), então o supervisor sabe sempre qual arquivo está com qual
+        processo. Um worker que sai por limite de arquivos ou de RSS é substituído
+        enquanto houver unidades. Um worker que morre sem avisar (ex.: OOM kill)
+        também é substituído, e o arquivo que ele processava é marcado como erro.
+        """
+        parametros = (config['salvar_texto_bruto'], config['arquivos_por_worker'],
+                      config['limite_rss_mb'], config['limite_store_mb'])
+
+        # 'spawn' em todas as plataformas: não herda Tk nem threads do processo da interface
+        contexto = multiprocessing.get_context('spawn')
+        fonte = enumerate(unidades)
+        proximas = collections.deque()
+        prontas = collections.deque()  # unidades que já trazem o resultado
+        em_voo = {}  # índice -> unidade entregue a um worker e ainda não devolvida
+        workers = {}  # conexão -> {'slot', 'processo', 'tarefa' em andamento}
+
+        def ha_tarefas():
+            while not proximas:
+                item = next(fonte, None)
+                if item is None:
+                    return False
+                if 'pronto' in item[1]:
+                    prontas.append((item[1], item[1]['pronto']))
+                else:
+                    proximas.append(item)
+            return True
+
+        def despachar(conexao):
+            worker = workers[conexao]
+            if ha_tarefas():
+                indice, unidade = proximas.popleft()
+                worker['tarefa'] = indice
+                em_voo[indice] = unidade
+                conexao.send((indice, unidade['caminho'], unidade.get('conteudo')))
+            else:
+                worker['tarefa'] = None
+                conexao.send(None)
+
+        def iniciar_worker(slot):
+            conexao, conexao_worker = contexto.Pipe()
+            processo = contexto.Process(target=worker_extracao, daemon=True,
+                                        args=(conexao_worker,) + parametros)
+            processo.start()
+            conexao_worker.close()  # Só o worker fica com a outra ponta; a morte dele vira EOF aqui
+            workers[conexao] = {'slot': slot, 'processo': processo, 'tarefa': None}
+            despachar(conexao)
+
+        def encerrar_worker(conexao, arquivos, pico_mb):
+            worker = workers.pop(conexao)
+            conexao.close()
+            worker['processo'].join()
+            registro = self.memoria_workers.setdefault(worker['slot'], {'pico_mb': None, 'arquivos': 0, 'reciclagens': 0})
+            if pico_mb is not None:
+                registro['pico_mb'] = max(registro['pico_mb'] or 0.0, pico_mb)
+            registro['arquivos'] += arquivos
+            if ha_tarefas():
+                registro['reciclagens'] += 1
+                iniciar_worker(worker['slot'])
+
+        def erro(unidade, motivo):
+            return unidade, {"Arquivo": unidade['arquivo'], "Status": "Erro", "Total_Paginas": 0, "Erro": motivo}
+
+        try:
+            for slot in range(1, config['workers'] + 1):
+                if not ha_tarefas():
+                    break
+                iniciar_worker(slot)
+
+            while workers or prontas:
+                while prontas:
+                    yield prontas.popleft()
+                if not workers:
+                    break
+                for conexao in multiprocessing.connection.wait(list(workers)):
+                    worker = workers[conexao]
+                    try:
+                        mensagem = conexao.recv()
+                    except EOFError:
+                        # Morreu sem enviar 'saida' (ex.: OOM kill): o arquivo em andamento vira erro.
+                        # O EOF pode chegar antes de o processo ser recolhido; sem o join, exitcode ainda é None
+                        worker['processo'].join(5)
+                        indice = worker['tarefa']
+                        if indice is not None:
+                            yield erro(em_voo.pop(indice), f"Worker encerrado inesperadamente (código {worker['processo'].exitcode})")
+                        encerrar_worker(conexao, 0, None)
+                        continue
+
+                    if mensagem[0] == 'resultado':
+                        _, indice, dados, continuar = mensagem
+                        unidade = em_voo.pop(indice)
+                        worker['tarefa'] = None
+                        if continuar:
+                            despachar(conexao)
+                        yield unidade, dados
+                    elif mensagem[0] == 'saida':
+                        _, arquivos, pico_mb, _ = mensagem
+                        encerrar_worker(conexao, arquivos, pico_mb)
+
+            # Rede de segurança: nenhum arquivo some do relatório sem uma linha de erro
+            for _, unidade in itertools.chain(sorted(em_voo.items()), proximas, fonte):
+                if 'pronto' in unidade:
+                    yield unidade, unidade['pronto']
+                else:
+                    yield erro(unidade, "Arquivo não processado (worker encerrado)")
+        finally:
+            for worker in workers.values():
+                worker['processo'].terminate()
+
+    def salvar_resultados(self, pasta: str, dados: List[Dict], salvar_texto_bruto: bool) -> None:
         """Salva os resultados em múltiplos formatos"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
@@ -248,7 +1186,7 @@ class ExtratorBoletosGUI:
         caminho_csv = os.path.join(pasta, f"resumo_boletos_{timestamp}.csv")
         df_limpo.to_csv(caminho_csv, index=False, encoding='utf-8-sig')
         
-        if self.var_backup_dados.get():
+        if salvar_texto_bruto:
             # Salva dados brutos para debug
             dados_debug = []
             for item in dados:
@@ -314,7 +1252,14 @@ class ExtratorBoletosGUI:
         
         item_id = self.tree.insert('', tk.END, values=valores_exibicao, tags=(tag,))
         self.dados_completos[item_id] = dados
+        seq = self.indice.adicionar(item_id, dados)
+        if self.filtro_ativo and not self.indice.corresponde(item_id, **self.filtro_ativo):
+            self.tree.detach(item_id)
+        else:
+            self.visiveis.append(seq)
         self.atualizar_estatisticas()
+        if self.filtro_ativo:
+            self.atualizar_label_filtro()
 
     def atualizar_estatisticas(self):
         total_items = len(self.dados_completos)
@@ -325,10 +1270,73 @@ class ExtratorBoletosGUI:
         
         self.label_stats.config(text=f"Total: {total_items} | ✅ Completos: {items_completos} | ⚠️ Parciais: {items_parciais} | 📱 Com QR: {items_com_qr} | 💰 Soma: R$ {soma_valores:.2f}")
 
+    def _converter_valor(self, texto: str) -> Optional[float]:
+        # Formato brasileiro, como em extrair_valor_inteligente: '.' é milhar e ',' é decimal
+        texto = texto.replace('R$', '').strip().replace('.', '').replace(',', '.')
+        try:
+            return float(texto)
+        except ValueError:
+            return None
+
+    def ler_filtro(self) -> Optional[Dict]:
+        """Lê os campos de filtro; entradas vazias ou inválidas são ignoradas"""
+        filtro = {
+            'termo': self.var_busca.get(),
+            'valor_min': self._converter_valor(self.var_valor_min.get()),
+            'valor_max': self._converter_valor(self.var_valor_max.get()),
+            'venc_min': IndiceBoletos.data_para_chave(self.var_venc_min.get()),
+            'venc_max': IndiceBoletos.data_para_chave(self.var_venc_max.get()),
+        }
+        if not filtro['termo'].strip() and all(filtro[k] is None for k in ('valor_min', 'valor_max', 'venc_min', 'venc_max')):
+            return None
+        return filtro
+
+    def agendar_filtro(self, *args):
+        if hasattr(self, '_filtro_job'):
+            self.root.after_cancel(self._filtro_job)
+        self._filtro_job = self.root.after(80, self.aplicar_filtro)
+
+    def aplicar_filtro(self):
+        self.filtro_ativo = self.ler_filtro()
+        seqs = self.indice.filtrar(**self.filtro_ativo) if self.filtro_ativo else None
+        if seqs is None:
+            seqs = list(range(len(self.indice.itens)))
+        self.exibir_itens(seqs)
+        self.atualizar_label_filtro()
+
+    def exibir_itens(self, seqs: List[int]):
+        """Atualiza a Treeview mexendo no mínimo possível de linhas"""
+        if seqs == self.visiveis:
+            return
+        itens = self.indice.itens
+        manter = set(seqs)
+        removidos = [s for s in self.visiveis if s not in manter]
+        # Estreitamento (caso comum ao digitar): só desanexa o que saiu, se for o menor lado
+        if len(self.visiveis) - len(removidos) == len(seqs) and len(removidos) <= len(seqs):
+            self.tree.detach(*[itens[s] for s in removidos])
+        else:
+            self.tree.set_children('', *[itens[s] for s in seqs])
+        self.visiveis = seqs
+
+    def atualizar_label_filtro(self):
+        if self.filtro_ativo:
+            self.label_filtro.config(text=f"Exibindo {len(self.visiveis)} de {len(self.dados_completos)} boletos")
+        else:
+            self.label_filtro.config(text="")
+
+    def limpar_filtro(self):
+        for var in (self.var_busca, self.var_valor_min, self.var_valor_max, self.var_venc_min, self.var_venc_max):
+            var.set('')
+        self.aplicar_filtro()
+
     def limpar_resultados(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        # Inclui itens ocultos pelo filtro, que não aparecem em get_children()
+        if self.dados_completos:
+            self.tree.delete(*self.dados_completos)
         self.dados_completos.clear()
+        self.indice.limpar()
+        self.visiveis = []
+        self.atualizar_label_filtro()
         self.progresso.set(0)
         self.status_atual.set("Pronto para processar")
         self.label_stats.config(text="")
@@ -531,6 +1539,8 @@ class ExtratorBoletosGUI:
         texto_tooltip = f"📄 {dados.get('Arquivo', '')}\n💰 Valor: {valor_formatado}\n📅 Vencimento: {dados.get('Vencimento', 'N/A')}\n"
         texto_tooltip += f"📱 QR Code: {'Sim' if dados.get('QR Code') != 'Não encontrado' else 'Não'}\n"
         texto_tooltip += f"📊 Status: {dados.get('Status', 'N/A')}\n📑 Páginas: {dados.get('Total_Paginas', 'N/A')}\n"
+        if 'Remetente' in dados:
+            texto_tooltip += f"📧 De: {dados['Remetente']} ({dados.get('Data_Email', 'N/A')})\n"
         texto_tooltip += f"\n💡 Duplo clique = Copiar linha | Clique direito = Menu"
         label_tooltip = tk.Label(self.tooltip, text=texto_tooltip, bg='#ffffe0', font=('Arial', 9), justify=tk.LEFT, padx=5, pady=5)
         label_tooltip.pack()
@@ -552,180 +1562,8 @@ class ExtratorBoletosGUI:
         else:
             messagebox.showwarning("Aviso", "Nenhuma pasta válida selecionada!")
 
-    # === MÉTODOS DE EXTRAÇÃO APRIMORADOS ===
-    
-    def extrair_qrcode_do_pdf(self, doc: fitz.Document) -> Optional[str]:
-        if not QR_CODE_DISPONIVEL:
-            return "Dependências não instaladas"
-        
-        todos_qrcodes_encontrados = []
-        for pagina in doc:
-            for img in pagina.get_images(full=True):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                try:
-                    pil_image = Image.open(io.BytesIO(image_bytes))
-                    for qr in decode(pil_image):
-                        todos_qrcodes_encontrados.append(qr.data.decode("utf-8"))
-                except Exception:
-                    continue
-        if not todos_qrcodes_encontrados:
-            return None
-        for qr_text in todos_qrcodes_encontrados:
-            if qr_text.startswith("000201"):
-                return qr_text
-        return todos_qrcodes_encontrados[0]
-
-    def extrair_valor_inteligente(self, texto: str, qr_code: str = None) -> Tuple[Optional[float], str]:
-        """Extração inteligente de valores com múltiplas estratégias"""
-        # 1. Tenta extrair do QR Code primeiro (mais confiável)
-        if qr_code and qr_code != 'Não encontrado':
-            try:
-                match_valor_qr = re.search(r'54\d{2}(\d+\.\d{2})', qr_code)
-                if match_valor_qr:
-                    valor = float(match_valor_qr.group(1))
-                    if 0.01 <= valor <= 999999.99:
-                        return valor, 'QR Code PIX'
-            except (ValueError, AttributeError):
-                pass
-        
-        # 2. Se não achou no QR, busca no texto
-        padroes_valor = [
-            (r'(?:VALOR\s+TOTAL|TOTAL\s+A\s+PAGAR|VALOR\s+DO\s+DOCUMENTO)\s*:?\s*R?\$?\s*([\d.,]+)', 'PDF - Campo Específico'),
-            (r'(\d{1,3}(?:\.\d{3})*,\d{2})', 'PDF - Formato Monetário'),
-        ]
-        
-        valores_encontrados = []
-        for padrao, fonte in padroes_valor:
-            matches = re.findall(padrao, texto, re.IGNORECASE)
-            for match in matches:
-                try:
-                    valor_limpo = match.replace('.', '').replace(',', '.')
-                    valor = float(valor_limpo)
-                    if 0.01 <= valor <= 999999.99:
-                        valores_encontrados.append(valor)
-                except ValueError:
-                    continue
-        
-        # 3. Heurística: se encontrou múltiplos valores, pega o maior (geralmente o total)
-        if valores_encontrados:
-            return max(valores_encontrados), 'PDF - Maior Valor'
-        
-        return None, 'Não encontrado'
-
-    def extrair_data_vencimento_inteligente(self, texto: str, qr_code: str = None) -> Tuple[Optional[str], str]:
-        """Extração inteligente de data de vencimento com múltiplas estratégias"""
-        datas_candidatas = []
-        padrao_data = re.finditer(r'(\d{1,2}[/.\-]\d{1,2}[/.\-]\d{4})', texto)
-        
-        for match in padrao_data:
-            data_str = match.group(1)
-            posicao = match.start()
-            try:
-                data_normalizada = data_str.replace('.', '/').replace('-', '/')
-                partes = data_normalizada.split('/')
-                if len(partes) == 3:
-                    dia, mes, ano = int(partes[0]), int(partes[1]), int(partes[2])
-                    if 1 <= dia <= 31 and 1 <= mes <= 12 and 2000 <= ano <= 2050:
-                        datas_candidatas.append({'data': data_normalizada, 'posicao': posicao})
-            except (ValueError, TypeError):
-                continue
-        
-        # 1. Tenta extrair do QR Code primeiro
-        if qr_code and qr_code != 'Não encontrado':
-            try:
-                match_venc_qr = re.search(r'Venc[.:]\s*(\d{1,2}[./]\d{1,2}[./]\d{4})', qr_code, re.IGNORECASE)
-                if match_venc_qr:
-                    return match_venc_qr.group(1).replace('.', '/'), 'QR Code'
-            except AttributeError:
-                pass
-        
-        if not datas_candidatas:
-            return None, 'Não encontrado'
-        
-        # 2. Procura por palavras-chave
-        palavras_vencimento = [r'VENCIMENTO', 'VENC.', 'VENC:', 'PAGAR ATÉ', 'DATA LIMITE', 'DATA DE VENCIMENTO']
-        for data_info in datas_candidatas:
-            inicio_contexto = max(0, data_info['posicao'] - 50)
-            contexto = texto[inicio_contexto:data_info['posicao']]
-            for palavra in palavras_vencimento:
-                if re.search(palavra, contexto, re.IGNORECASE):
-                    return data_info['data'], f'PDF - Contexto ({palavra})'
-        
-        # 3. Pega a última data do documento
-        return datas_candidatas[-1]['data'], 'PDF - Última Encontrada'
-
-    def extrair_linha_digitavel_melhorada(self, texto: str) -> Tuple[Optional[str], str]:
-        """
-        Extração definitiva da linha digitável, tentando os padrões mais comuns em ordem.
-        """
-        # 1. Tenta o padrão de Boleto Bancário (47 dígitos, mais complexo e específico)
-        #    Usa s* para aceitar "zero ou mais espaços", corrigindo a regressão.
-        padrao_bancario = re.compile(r'(\d{5}\.?\d{5}\s*?\d{5}\.?\d{6}\s*?\d{5}\.?\d{6}\s*?\d\s*?\d{14})')
-        match = padrao_bancario.search(texto)
-        if match:
-            return match.group(1).strip(), 'PDF - Boleto Bancário'
-
-        # 2. Se não achou, tenta o padrão de Conta Convênio (48 dígitos)
-        #    Este geralmente tem espaços, então usamos s+ (um ou mais espaços).
-        padrao_convenio = re.compile(r'(\d{11,12}\s+\d{11,12}\s+\d{11,12}\s+\d{11,12})')
-        match = padrao_convenio.search(texto)
-        if match:
-            return match.group(1).strip(), 'PDF - Conta Convênio'
-            
-        return None, 'Não encontrado'
-
-    def extrair_dados_boleto_avancado(self, caminho_pdf: str) -> Optional[Dict[str, str]]:
-        """Versão aprimorada da extração com análise inteligente"""
-        try:
-            doc = fitz.open(caminho_pdf)
-            total_paginas = len(doc)
-        except Exception as e:
-            return {"Arquivo": os.path.basename(caminho_pdf), "Erro": str(e), "Status": "Erro", "Total_Paginas": 0}
-
-        textos_por_pagina = [{'numero': i+1, 'texto': p.get_text("text")} for i, p in enumerate(doc)]
-        texto_completo = "\n\n--- PÁGINA {} ---\n\n".format(textos_por_pagina[0]['numero']).join([p['texto'] for p in textos_por_pagina])
-
-        dados_boleto = {
-            "Arquivo": os.path.basename(caminho_pdf), "Total_Paginas": total_paginas,
-            "Linha Digitável": "Não encontrado", "Valor": "Não encontrado",
-            "Vencimento": "Não encontrado", "QR Code": "Não encontrado", "Status": "Erro"
-        }
-        if self.var_backup_dados.get():
-            dados_boleto["Texto_Bruto"] = texto_completo
-
-        # Extrações
-        qr_code = self.extrair_qrcode_do_pdf(doc)
-        if qr_code: dados_boleto["QR Code"] = qr_code
-
-        linha, fonte_linha = self.extrair_linha_digitavel_melhorada(texto_completo)
-        if linha: dados_boleto["Linha Digitável"], dados_boleto["Fonte_Linha"] = linha, fonte_linha
-
-        valor, fonte_valor = self.extrair_valor_inteligente(texto_completo, qr_code)
-        if valor: dados_boleto["Valor"], dados_boleto["Fonte_Valor"] = valor, fonte_valor
-
-        vencimento, fonte_vencimento = self.extrair_data_vencimento_inteligente(texto_completo, qr_code)
-        if vencimento: dados_boleto["Vencimento"], dados_boleto["Fonte_Vencimento"] = vencimento, fonte_vencimento
-
-        # Determina status final
-        campos_ok = sum(1 for k in ["Linha Digitável", "Valor", "Vencimento"] if dados_boleto[k] != "Não encontrado")
-        if campos_ok >= 3:
-            dados_boleto["Status"] = "Completo"
-        elif campos_ok >= 1:
-            dados_boleto["Status"] = "Parcial"
-        else:
-            dados_boleto["Status"] = "Não Encontrado"
-
-        doc.close()
-        
-        if not self.var_backup_dados.get():
-            for k in ["Fonte_Linha", "Fonte_Valor", "Fonte_Vencimento", "Texto_Bruto"]:
-                dados_boleto.pop(k, None)
-        
-        return dados_boleto
-
 def main():
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = ExtratorBoletosGUI(root)
     root.mainloop()